@@ -16,155 +16,505 @@ Options:
 import sys
 import os
 import argparse
-from lexer import Lexer
-from parser import Parser
-from codegen import CodeGen
+import glob
+import hashlib
+import json
+import mmap
+import platform
+import shutil
+import subprocess
 
-def main():
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description='Blitz compiler')
-    parser.add_argument('input_file', help='Input .blitz file')
-    parser.add_argument('-o', '-O', '--output', help='Output file name')
-    parser.add_argument('-r', '-R', '--run', action='store_true', help='Run after compilation')
-    parser.add_argument('-s', '-S', '--assembly-only', action='store_true', help='Generate assembly only, do not assemble or link')
-    args = parser.parse_args()
-    
-    # Check if input file exists and has .blitz extension
-    if not os.path.exists(args.input_file):
-        print(f"Error: Input file '{args.input_file}' not found.")
-        return 1
-    
-    if not args.input_file.endswith('.blitz'):
-        print(f"Warning: Input file '{args.input_file}' does not have .blitz extension.")
-    
-    # Determine output file name
-    output_file = args.output if args.output else os.path.splitext(args.input_file)[0]
-    
+# Bump on any change that affects generated assembly; keys the asm cache
+COMPILER_VERSION = "0.1.0"
+
+# Progress messages are queued and written in one flush at exit; console
+# writes are a syscall each (and notoriously slow on Windows consoles)
+_log_lines = []
+_quiet = False
+
+def _log(message):
+    """Queue a progress message for the end-of-run flush."""
+    if not _quiet:
+        _log_lines.append(message)
+
+def _flush_log():
+    """Write all queued progress messages with a single stdout write."""
+    if _log_lines:
+        sys.stdout.write('\n'.join(_log_lines) + '\n')
+        _log_lines.clear()
+
+def _error(message):
+    """Report an error immediately, after flushing queued progress."""
+    _flush_log()
+    print(message)
+
+def _cache_dir():
+    """Return the blitzc cache directory."""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'blitzc')
+
+def _toolchain_cache_path():
+    """Return the path of the cached toolchain discovery results."""
+    return os.path.join(_cache_dir(), 'toolchain.json')
+
+def _load_toolchain_cache():
+    """Load cached Visual Studio / Windows SDK paths, or None if stale/missing."""
     try:
-        # Read input file
-        with open(args.input_file, 'r') as f:
-            source_code = f.read()
-        
-        # Compilation pipeline
-        lexer = Lexer(source_code)
-        tokens = lexer.tokenize()
-        
-        parser = Parser(tokens)
-        ast = parser.parse()
-        
-        codegen = CodeGen(ast)
-        asm_code = codegen.generate()
-        
-        # Write assembly output
-        asm_file = f"{output_file}.asm"
-        with open(asm_file, 'w') as f:
+        with open(_toolchain_cache_path(), 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # A Windows upgrade may move or remove the toolchain
+    if cached.get('os_release') != platform.release():
+        return None
+
+    # Re-validate the cached install with a single stat
+    if not cached.get('vs_path') or not os.path.exists(cached['vs_path']):
+        return None
+
+    return cached
+
+def _save_toolchain_cache(vs_path, sdk_dir, msvcrt_dir):
+    """Persist discovered toolchain paths so later runs skip the probing."""
+    cache_path = _toolchain_cache_path()
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump({
+                'os_release': platform.release(),
+                'vs_path': vs_path,
+                'sdk_dir': sdk_dir,
+                'msvcrt_dir': msvcrt_dir,
+            }, f)
+    except OSError:
+        pass  # Caching is best-effort; discovery still ran
+
+def generate_asm(input_file):
+    """Run the lex/parse/codegen pipeline and return the assembly text."""
+    # Map the input file instead of an eager read; page faults pull bytes
+    # in while lexing proceeds, and the page cache stays warm for reruns
+    fd = os.open(input_file, os.O_RDONLY)
+    try:
+        try:
+            mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            source_bytes = b""  # Empty files cannot be mapped
+        else:
+            with mm:
+                source_bytes = mm[:]
+    finally:
+        os.close(fd)
+
+    # Unchanged sources compile to identical assembly, so a content hash
+    # (keyed by compiler version) lets us skip the whole front-end
+    key = hashlib.blake2b(
+        source_bytes + COMPILER_VERSION.encode(), digest_size=16).hexdigest()
+    cache_path = os.path.join(_cache_dir(), f"{key}.asm")
+    try:
+        with open(cache_path, 'r') as f:
+            return f.read()
+    except OSError:
+        pass
+
+    # Compilation pipeline. Imported lazily so --help, error paths and
+    # cache hits never pay the front-end import cost
+    from lexer import Lexer
+    from parser import Parser
+    from codegen import CodeGen
+
+    source_code = source_bytes.decode('utf-8')
+    lexer = Lexer(source_code)
+
+    # Single pass: the parser pulls tokens straight from the lexer, so
+    # the full token list is never materialized
+    parser = Parser(lexer.iter_tokens())
+    ast = parser.parse()
+
+    codegen = CodeGen(ast)
+    asm_code = codegen.generate()
+
+    # Populate the cache atomically; caching is best-effort
+    try:
+        os.makedirs(_cache_dir(), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
             f.write(asm_code)
-            
-        print(f"Generated assembly: {asm_file}")
-        
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+    return asm_code
+
+def compile_to_asm(input_file, asm_file):
+    """Run the pipeline and write the assembly to a file."""
+    # Encode once and write unbuffered in a single shot, skipping the
+    # chunked re-encode through TextIOWrapper
+    asm_bytes = generate_asm(input_file).encode()
+    with open(asm_file, 'wb', buffering=0) as f:
+        f.write(asm_bytes)
+
+def _newest_subdir(base, prefix, tail):
+    """Return the highest-versioned subdirectory of base that contains tail.
+
+    One scandir of base replaces a stat per hardcoded version candidate,
+    and automatically picks up versions newer than any we know about.
+    """
+    try:
+        with os.scandir(base) as it:
+            versions = sorted(
+                (entry.name for entry in it if entry.is_dir() and entry.name.startswith(prefix)),
+                reverse=True)
+    except OSError:
+        return None
+
+    for version in versions:
+        candidate = os.path.join(base, version, *tail)
+        if os.path.isdir(candidate):
+            return candidate
+
+    return None
+
+def _windows_toolchain():
+    """Locate Visual Studio / Windows SDK libraries, preferring the cache."""
+    cached = _load_toolchain_cache()
+    if cached:
+        return cached.get('vs_path'), cached.get('sdk_dir'), cached.get('msvcrt_dir')
+
+    vs_path = None
+    sdk_dir = None
+    msvcrt_dir = None
+
+    # Program Files is localized on non-English Windows, so resolve the
+    # roots from the environment instead of hardcoding the English names
+    pf = os.environ.get('ProgramFiles', "C:\\Program Files")
+    pf_x86 = os.environ.get('ProgramFiles(x86)', "C:\\Program Files (x86)")
+
+    # Ask vswhere for the newest Visual Studio install when available
+    vswhere = os.path.join(pf_x86, "Microsoft Visual Studio", "Installer", "vswhere.exe")
+    if os.path.exists(vswhere):
+        result = subprocess.run(
+            [vswhere, "-latest", "-property", "installationPath"],
+            capture_output=True, text=True)
+        if result.returncode == 0 and result.stdout.strip():
+            vs_path = result.stdout.strip()
+
+    # Fall back to a glob over the usual install roots
+    if vs_path is None:
+        candidates = []
+        for root in {pf, pf_x86}:
+            candidates.extend(glob.glob(os.path.join(root, "Microsoft Visual Studio", "20*")))
+        vs_path = max(candidates) if candidates else None
+
+    # If we found Visual Studio, try to use its libraries
+    if vs_path:
+        # Look for the newest Windows SDK libraries
+        sdk_dir = _newest_subdir(
+            os.path.join(pf_x86, "Windows Kits", "10", "Lib"), "10.", ("um", "x64"))
+
+        # Look for the newest Visual Studio CRT library. vswhere returns the
+        # full install path; the glob fallback returns a year directory whose
+        # edition subdirectory (Community/Enterprise/...) still needs picking.
+        msvc_root = os.path.join(vs_path, "VC", "Tools", "MSVC")
+        if not os.path.isdir(msvc_root):
+            msvc_root = _newest_subdir(vs_path, "", ("VC", "Tools", "MSVC"))
+        msvcrt_dir = _newest_subdir(msvc_root, "", ("lib", "x64")) if msvc_root else None
+
+        _save_toolchain_cache(vs_path, sdk_dir, msvcrt_dir)
+
+    return vs_path, sdk_dir, msvcrt_dir
+
+_nasm_cache = None
+
+def _nasm():
+    """Resolve the nasm executable once; batch builds spawn it per unit."""
+    global _nasm_cache
+    if _nasm_cache is None:
+        _nasm_cache = shutil.which("nasm") or "nasm"
+    return _nasm_cache
+
+_linker_cache = None
+
+def _linker():
+    """Pick the linker: prefer LLD when installed, it links much faster."""
+    global _linker_cache
+    if _linker_cache is None:
+        if os.name == 'nt':
+            _linker_cache = "lld-link" if shutil.which("lld-link") else "link"
+        else:
+            _linker_cache = "ld.lld" if shutil.which("ld.lld") else "ld"
+    return _linker_cache
+
+def _toolchain_commands(output_file, nasm_input):
+    """Build (nasm_argv, link_argv, exe_file) for one translation unit."""
+    if os.name == 'nt':
+        obj_file = f"{output_file}.obj"
+        nasm_argv = [_nasm(), "-fwin64", nasm_input, "-o", obj_file]
+
+        vs_path, sdk_dir, msvcrt_dir = _windows_toolchain()
+
+        # Build the link command with necessary libraries
+        link_argv = [
+            _linker(), obj_file, f"/OUT:{output_file}.exe",
+            "/NOLOGO", "/SUBSYSTEM:CONSOLE", "/ENTRY:main"
+        ]
+
+        if vs_path:
+            # Add library paths if found
+            if sdk_dir:
+                link_argv.append(f"/LIBPATH:{sdk_dir}")
+
+            if msvcrt_dir:
+                link_argv.append(f"/LIBPATH:{msvcrt_dir}")
+
+            # Add the Windows kernel library for console functions
+            link_argv.append("kernel32.lib")
+
+        exe_file = f"{output_file}.exe"
+    else:
+        obj_file = f"{output_file}.o"
+        nasm_argv = [_nasm(), "-felf64", nasm_input, "-o", obj_file]
+        link_argv = [_linker(), "-o", output_file, obj_file]
+        exe_file = output_file
+
+    return nasm_argv, link_argv, exe_file
+
+def _assemble_and_link(output_file, nasm_input, asm_bytes=None):
+    """Assemble and link one unit; returns the executable path or None."""
+    nasm_argv, link_argv, exe_file = _toolchain_commands(output_file, nasm_input)
+
+    _log(f"Assembling with: {' '.join(nasm_argv)}")
+    # A missing nasm surfaces as FileNotFoundError from subprocess, not a
+    # nonzero exit; catch OSError so batch builds report the guidance
+    # below instead of escaping with a raw traceback.
+    # close_fds=False keeps subprocess on the cheap posix_spawn path
+    try:
+        if asm_bytes is not None:
+            # Streaming over stdin ("-") skips the .asm temp file, but NASM
+            # does not document "-" as an input and released builds reject
+            # it, so treat it as opportunistic: try quietly, and on any
+            # failure write the .asm file and assemble that. Genuine
+            # assembly errors reproduce on the retry and are reported from
+            # there.
+            nasm_result = subprocess.run(nasm_argv, input=asm_bytes, check=False,
+                                         close_fds=False, capture_output=True)
+            if nasm_result.returncode != 0:
+                asm_file = f"{output_file}.asm"
+                with open(asm_file, 'wb', buffering=0) as f:
+                    f.write(asm_bytes)
+                nasm_argv, link_argv, exe_file = _toolchain_commands(output_file, asm_file)
+                _log(f"Assembling with: {' '.join(nasm_argv)}")
+                nasm_result = subprocess.run(nasm_argv, check=False, close_fds=False)
+        else:
+            nasm_result = subprocess.run(nasm_argv, check=False, close_fds=False)
+    except OSError:
+        nasm_result = None
+
+    if nasm_result is None or nasm_result.returncode != 0:
+        _error("Error: NASM assembler failed. Make sure NASM is installed and in your PATH.\n"
+               "On Windows, download from https://www.nasm.us/ and add to PATH.")
+        return None
+
+    _log(f"Linking with: {' '.join(link_argv)}")
+    try:
+        link_result = subprocess.run(link_argv, check=False, close_fds=False)
+    except OSError:
+        link_result = None
+
+    if link_result is None or link_result.returncode != 0:
+        _error("Error: Linker failed. Make sure the linker is installed and in your PATH.\n"
+               "On Windows, you need Visual Studio or the Windows SDK for link.exe.")
+        return None
+
+    return exe_file
+
+def _run_exe(exe_file):
+    """Run a freshly built executable and report its exit code."""
+    _log(f"Running {exe_file}...")
+    _flush_log()
+    run_path = exe_file if os.path.dirname(exe_file) else os.path.join(".", exe_file)
+    run_result = subprocess.run([run_path], check=False)
+    _log(f"Program exited with code {run_result.returncode}")
+
+def _exe_name(output_file):
+    """Return the executable path produced for an output base name."""
+    return f"{output_file}.exe" if os.name == 'nt' else output_file
+
+def _is_up_to_date(input_file, exe_file):
+    """Make-style check: the executable exists and is newer than the source."""
+    try:
+        return os.path.getmtime(exe_file) >= os.path.getmtime(input_file)
+    except OSError:
+        return False
+
+def _output_name(input_file, args):
+    """Determine the output base name for an input file."""
+    if args.output and len(args.input_files) == 1:
+        return args.output
+    return os.path.splitext(input_file)[0]
+
+def _compile_single(input_file, output_file, args):
+    """Single-file build: the classic lex->parse->codegen->nasm->link flow."""
+    try:
+        asm_file = f"{output_file}.asm"
+
+        # Inner invocation: just run the pipeline and exit (see --pypy)
+        if args.inner_compile:
+            compile_to_asm(input_file, asm_file)
+            return 0
+
+        # No-op rebuild: skip nasm and link entirely
+        if not args.assembly_only and _is_up_to_date(input_file, _exe_name(output_file)):
+            exe_file = _exe_name(output_file)
+            _log(f"{exe_file} is up to date.")
+            if args.run:
+                _run_exe(exe_file)
+            return 0
+
+        # Optionally run the interpreter-bound front-end under pypy3,
+        # keeping toolchain orchestration in the outer CPython process.
+        # The pypy path hands the assembly over through the .asm file;
+        # the in-process path streams it straight to NASM's stdin.
+        asm_bytes = None
+        use_pypy = args.pypy or os.environ.get('BLITZC_PYPY') == '1'
+        if use_pypy and shutil.which('pypy3'):
+            inner = subprocess.run(
+                ["pypy3", os.path.abspath(__file__), "--_inner-compile",
+                 input_file, "-o", output_file],
+                check=False)
+            if inner.returncode != 0:
+                return inner.returncode
+            _log(f"Generated assembly: {asm_file}")
+        elif args.assembly_only:
+            compile_to_asm(input_file, asm_file)
+            _log(f"Generated assembly: {asm_file}")
+        else:
+            asm_bytes = generate_asm(input_file).encode()
+
         # If assembly-only option is specified, stop here
         if args.assembly_only:
-            print(f"Assembly-only mode: Skipping assembly and linking steps.")
+            _log(f"Assembly-only mode: Skipping assembly and linking steps.")
             return 0
-            
-        # Otherwise, continue with assembly and linking
-        # Check if we're on Windows
-        is_windows = os.name == 'nt'
-        
-        # Determine appropriate commands and formats
-        if is_windows:
-            obj_format = "win64"
-            nasm_cmd = f"nasm -f{obj_format} {asm_file} -o {output_file}.obj"
-            
-            # Try to find Visual Studio installation path
-            vs_path = None
-            potential_paths = [
-                "C:\\Program Files\\Microsoft Visual Studio\\2022",
-                "C:\\Program Files\\Microsoft Visual Studio\\2019",
-                "C:\\Program Files (x86)\\Microsoft Visual Studio\\2019",
-                "C:\\Program Files (x86)\\Microsoft Visual Studio\\2017"
-            ]
-            
-            for path in potential_paths:
-                if os.path.exists(path):
-                    vs_path = path
-                    break
-            
-            # If we found Visual Studio, try to use its libraries
-            if vs_path:
-                # Try to find Windows SDK directory for msvcrt.lib
-                sdk_dir = None
-                msvcrt_dir = None
-                
-                # Look for Windows SDK
-                for path in ["C:\\Program Files (x86)\\Windows Kits\\10\\Lib\\10.0.19041.0\\um\\x64",
-                             "C:\\Program Files (x86)\\Windows Kits\\10\\Lib\\10.0.18362.0\\um\\x64",
-                             "C:\\Program Files (x86)\\Windows Kits\\10\\Lib\\10.0.17763.0\\um\\x64"]:
-                    if os.path.exists(path):
-                        sdk_dir = path
-                        break
-                
-                # Look for Visual Studio CRT library
-                for path in ["C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\Community\\VC\\Tools\\MSVC\\14.29.30133\\lib\\x64",
-                             "C:\\Program Files (x86)\\Microsoft Visual Studio\\2019\\Enterprise\\VC\\Tools\\MSVC\\14.29.30133\\lib\\x64",
-                             "C:\\Program Files\\Microsoft Visual Studio\\2022\\Community\\VC\\Tools\\MSVC\\14.30.30705\\lib\\x64",
-                             "C:\\Program Files\\Microsoft Visual Studio\\2022\\Enterprise\\VC\\Tools\\MSVC\\14.30.30705\\lib\\x64"]:
-                    if os.path.exists(path):
-                        msvcrt_dir = path
-                        break
-                
-                # Build the link command with necessary libraries
-                link_cmd = f"link {output_file}.obj /OUT:{output_file}.exe /NOLOGO /SUBSYSTEM:CONSOLE /ENTRY:main"
-                
-                # Add library paths if found
-                if sdk_dir:
-                    link_cmd += f" /LIBPATH:\"{sdk_dir}\""
-                
-                if msvcrt_dir:
-                    link_cmd += f" /LIBPATH:\"{msvcrt_dir}\""
-                
-                # Add the Windows kernel library for console functions
-                link_cmd += " kernel32.lib"
-                
-            exe_file = f"{output_file}.exe"
-        else:
-            obj_format = "elf64"
-            nasm_cmd = f"nasm -f{obj_format} {asm_file} -o {output_file}.o"
-            link_cmd = f"ld -o {output_file} {output_file}.o"
-            exe_file = output_file
-        
-        print(f"Assembling with: {nasm_cmd}")
-        nasm_result = os.system(nasm_cmd)
-        
-        if nasm_result != 0:
-            print(f"Error: NASM assembler failed. Make sure NASM is installed and in your PATH.")
-            print(f"On Windows, download from https://www.nasm.us/ and add to PATH.")
-            return 1
-        
-        print(f"Linking with: {link_cmd}")
-        link_result = os.system(link_cmd)
-        
-        if link_result != 0:
-            print(f"Error: Linker failed. Make sure the linker is installed and in your PATH.")
-            print(f"On Windows, you need Visual Studio or the Windows SDK for link.exe.")
+
+        # Read the asm from stdin ("-") when it was kept in memory
+        nasm_input = asm_file if asm_bytes is None else "-"
+        exe_file = _assemble_and_link(output_file, nasm_input, asm_bytes)
+        if exe_file is None:
             return 1
-        
-        print(f"Successfully compiled {args.input_file} to {exe_file}")
-        
+
+        _log(f"Successfully compiled {input_file} to {exe_file}")
+
         # Run the compiled program if requested
         if args.run:
-            print(f"Running {exe_file}...")
-            if is_windows:
-                exit_code = os.system(exe_file)
-            else:
-                exit_code = os.system(f"./{exe_file}")
-            print(f"Program exited with code {exit_code >> 8}")
-        
+            _run_exe(exe_file)
+
         return 0
-        
+
     except Exception as e:
-        print(f"Compilation error: {str(e)}")
+        _error(f"Compilation error: {str(e)}")
         return 1
 
+def _compile_many(args):
+    """Multi-file build: pipeline codegen (processes) with tool runs (threads).
+
+    Codegen is CPU-bound Python, so it goes to a process pool; nasm/link are
+    subprocess waits, so overlapping them on threads lets assembly and
+    linking of finished units run concurrently with codegen of later ones.
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+    units = []
+    exe_files = []
+    failed = False
+
+    for input_file in args.input_files:
+        output_file = _output_name(input_file, args)
+        # No-op rebuilds skip the pipeline and the tool invocations
+        if not args.assembly_only and _is_up_to_date(input_file, _exe_name(output_file)):
+            exe_file = _exe_name(output_file)
+            _log(f"{exe_file} is up to date.")
+            exe_files.append(exe_file)
+        else:
+            units.append((input_file, output_file))
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as codegen_pool, \
+         ThreadPoolExecutor(max_workers=os.cpu_count()) as tool_pool:
+        asm_futures = {
+            codegen_pool.submit(compile_to_asm, input_file, f"{output_file}.asm"): (input_file, output_file)
+            for input_file, output_file in units
+        }
+
+        tool_futures = {}
+        for future in as_completed(asm_futures):
+            input_file, output_file = asm_futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                _error(f"Compilation error in {input_file}: {str(e)}")
+                failed = True
+                continue
+
+            _log(f"Generated assembly: {output_file}.asm")
+            if not args.assembly_only:
+                tool_futures[tool_pool.submit(
+                    _assemble_and_link, output_file, f"{output_file}.asm")] = (input_file, output_file)
+
+        for future in as_completed(tool_futures):
+            input_file, output_file = tool_futures[future]
+            exe_file = future.result()
+            if exe_file is None:
+                failed = True
+            else:
+                _log(f"Successfully compiled {input_file} to {exe_file}")
+                exe_files.append(exe_file)
+
+    if failed:
+        return 1
+
+    # Run the compiled programs if requested
+    if args.run:
+        for exe_file in exe_files:
+            _run_exe(exe_file)
+
+    return 0
+
+def main():
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Blitz compiler')
+    parser.add_argument('input_files', nargs='+', metavar='input_file', help='Input .blitz files')
+    parser.add_argument('-o', '-O', '--output', help='Output file name (single input only)')
+    parser.add_argument('-r', '-R', '--run', action='store_true', help='Run after compilation')
+    parser.add_argument('-s', '-S', '--assembly-only', action='store_true', help='Generate assembly only, do not assemble or link')
+    parser.add_argument('--pypy', action='store_true', help='Run the compile pipeline under pypy3 when available')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Suppress progress messages')
+    parser.add_argument('--_inner-compile', dest='inner_compile', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    global _quiet
+    _quiet = args.quiet
+
+    if args.output and len(args.input_files) > 1:
+        _error("Error: -o/--output is only valid with a single input file.")
+        return 1
+
+    for input_file in args.input_files:
+        # Check if input file exists and has .blitz extension
+        if not os.path.exists(input_file):
+            _error(f"Error: Input file '{input_file}' not found.")
+            return 1
+
+        if not input_file.endswith('.blitz'):
+            _log(f"Warning: Input file '{input_file}' does not have .blitz extension.")
+
+    # Single-file builds keep the classic serial flow
+    try:
+        if len(args.input_files) == 1:
+            input_file = args.input_files[0]
+            return _compile_single(input_file, _output_name(input_file, args), args)
+
+        return _compile_many(args)
+    finally:
+        _flush_log()
+
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
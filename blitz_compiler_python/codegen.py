@@ -3,6 +3,7 @@ Code Generator for the Blitz programming language.
 Converts AST into x86_64 assembly code.
 """
 
+import io
 import os
 
 from parser import (
@@ -10,24 +11,221 @@ from parser import (
     NumberNode, StringNode, BinaryOpNode, VariableNode, DeclarationNode, CallNode
 )
 from lexer import TokenType
-import os
 
 class CodeGenError(Exception):
     """Exception raised for errors during code generation."""
     pass
 
+# Fixed instruction sequences emitted as single buffer writes. Each is an
+# immutable module-level string built exactly once; the only per-expansion
+# work is substituting the __ID__ label suffix (or name/frame size in the
+# prologue) with str.replace, which is cheaper than .format for one or two
+# placeholders, followed by a single write.
+_TEMPLATES = {
+    "prologue": """
+
+__NAME__:
+    push rbp
+    mov rbp, rsp
+    sub rsp, __FRAME__
+""",
+    "num2str": """\
+    push rdi             ; Save buffer pointer
+    mov rcx, 0xCCCCCCCCCCCCCCCD ; Reciprocal of 10 (2^67 / 10, rounded up)
+    mov rbx, digit_buffer ; Use digit buffer
+    add rbx, 10          ; Start at end of buffer
+    mov byte [rbx], 0    ; Null terminator
+    .num_to_str_loop___ID__:
+    mov r8, rax          ; Keep the value for the remainder
+    mul rcx              ; rdx = high half of value * reciprocal
+    shr rdx, 3           ; rdx = value / 10
+    lea rax, [rdx+rdx*4] ; Quotient * 5
+    add rax, rax         ; Quotient * 10
+    sub r8, rax          ; Remainder = value - quotient * 10
+    add r8b, '0'         ; Convert to ASCII
+    mov [rbx-1], r8b     ; Store digit below the cursor
+    lea rbx, [rbx-1]     ; Step back without touching flags
+    mov rax, rdx         ; Continue with the quotient
+    test rax, rax        ; Check if done
+    jnz .num_to_str_loop___ID__ ; Continue if not zero
+    pop rdi              ; Restore buffer pointer
+    mov rsi, rbx         ; Source string
+    call _string_copy    ; Copy string to buffer
+""",
+    "print_string": """\
+    mov dword [last_printed_value], 1  ; Store 1 to indicate success
+    ; Save the string pointer
+    mov rsi, rax              ; Save string pointer in rsi
+    ; Calculate string length
+    pxor xmm0, xmm0           ; All-zero pattern: search for the null byte
+    mov rdi, rsi              ; String pointer
+    sub rdi, 16               ; Bias for the pre-increment below
+    .strlen_loop___ID__:
+    add rdi, 16               ; Advance to the next 16-byte block
+    pcmpistri xmm0, [rdi], 0x08 ; rcx = index of first null in block
+    jnz .strlen_loop___ID__        ; ZF clear while no null byte seen
+    add rdi, rcx              ; Address of the null terminator
+    sub rdi, rsi              ; Length = end - start
+    ; Append the payload and CRLF to the pending-output buffer -- but
+    ; only once it is known to fit: flush first when the buffer is too
+    ; full, and hand payloads larger than the buffer itself straight to
+    ; WriteConsoleA
+    mov r12, rsi              ; String pointer survives the calls below
+    lea rcx, [rdi+2]          ; Payload plus CRLF
+    cmp rcx, 4096             ; Larger than the whole buffer?
+    ja .print_direct___ID__
+    add rcx, [out_pos]        ; Pending length if appended
+    cmp rcx, 4096             ; Would the append overflow?
+    jbe .print_append___ID__
+    call _flush_stdout        ; Make room first; rsi/rdi survive the call
+    .print_append___ID__:
+    mov rcx, rdi              ; Byte count for rep movsb
+    mov rdi, stdout_buffer    ; Pending-output buffer base
+    add rdi, [out_pos]        ; Append position
+    rep movsb                 ; Copy the payload
+    mov word [rdi], 0x0A0D    ; CR, LF
+    add rdi, 2                ; Account for the newline
+    sub rdi, stdout_buffer    ; New pending length
+    mov [out_pos], rdi        ; Remember it
+    cmp rdi, 3840             ; Flush early when the buffer is nearly full
+    jb .print_done___ID__
+    call _flush_stdout
+    jmp .print_done___ID__
+    .print_direct___ID__:
+    call _flush_stdout        ; Keep output ordered: drain the buffer first
+    mov r13, rdi              ; Payload length survives the API calls
+    mov rcx, STD_OUTPUT_HANDLE ; First argument: handle type (stdout)
+    sub rsp, 32               ; Shadow space for Win64 calling convention
+    call GetStdHandle         ; Get handle to stdout
+    add rsp, 32               ; Restore stack
+    mov rcx, rax              ; First argument: handle to stdout
+    mov rdx, r12              ; Second argument: the payload itself
+    mov r8, r13               ; Third argument: payload length
+    lea r9, [chars_written]   ; Fourth argument: pointer to chars_written
+    push 0                    ; Fifth argument: reserved (NULL)
+    sub rsp, 32               ; Shadow space for Win64 calling convention
+    call WriteConsoleA        ; Write the oversized payload directly
+    add rsp, 40               ; Restore stack (32 + 8 for the push)
+    mov word [stdout_buffer], 0x0A0D ; Buffer is empty; queue just the CRLF
+    mov qword [out_pos], 2
+    .print_done___ID__:
+    mov rax, r12              ; Restore string pointer to rax
+""",
+    "print_int": """\
+    mov dword [last_printed_value], eax  ; Store the integer value
+    ; Convert integer to string, two digits per iteration via the
+    ; digit_pairs table
+    mov rcx, 0x28F5C28F5C28F5C3 ; Reciprocal of 100 (2^68 / 100, rounded up)
+    mov r9, digit_pairs        ; ASCII table of all two-digit pairs
+    mov rbx, output_buffer     ; Use our output buffer
+    add rbx, 30                ; Start at the end of buffer
+    mov byte [rbx], 0          ; Null terminator
+    .int_to_str_loop___ID__:
+    mov r8, rax                ; Keep the value for the remainder
+    shr rax, 2                 ; Pre-shift: (n * C) >> 68 is off by one for
+                               ; huge n, ((n >> 2) * C) >> 66 never is
+    mul rcx                    ; rdx = high half of (value / 4) * reciprocal
+    shr rdx, 2                 ; rdx = value / 100 (68-bit shift in total)
+    lea rax, [rdx+rdx*4]       ; Quotient * 5
+    lea rax, [rax+rax*4]       ; Quotient * 25
+    shl rax, 2                 ; Quotient * 100
+    sub r8, rax                ; Remainder = value - quotient * 100 (0..99)
+    movzx r8, word [r9+r8*2]   ; Both ASCII digits of the pair at once
+    mov [rbx-2], r8w           ; Store both digits below the cursor
+    lea rbx, [rbx-2]           ; Step back without touching flags
+    mov rax, rdx               ; Continue with the quotient
+    test rax, rax              ; Check if done
+    jnz .int_to_str_loop___ID__           ; Continue if not zero
+    cmp byte [rbx], '0'        ; Odd digit count leaves a leading zero
+    jne .int_to_str_done___ID__
+    inc rbx                    ; Skip it
+    .int_to_str_done___ID__:
+    ; Append the digits and CRLF to the pending-output buffer
+    mov rsi, rbx              ; First digit
+    mov rcx, output_buffer
+    add rcx, 30               ; End of the digits
+    sub rcx, rbx              ; Byte count for rep movsb
+    mov rdi, stdout_buffer    ; Pending-output buffer base
+    add rdi, [out_pos]        ; Append position
+    rep movsb                 ; Copy the digits
+    mov word [rdi], 0x0A0D    ; CR, LF
+    add rdi, 2                ; Account for the newline
+    sub rdi, stdout_buffer    ; New pending length
+    mov [out_pos], rdi        ; Remember it
+    cmp rdi, 3840             ; Flush early when the buffer is nearly full
+    jb .no_flush___ID__
+    call _flush_stdout
+    .no_flush___ID__:
+""",
+    "string_copy": """\
+
+; Helper function to copy a string
+_string_copy:
+    xor rcx, rcx         ; Clear counter
+    pxor xmm1, xmm1      ; All-zero pattern for the terminator test
+    .copy_loop:
+    movdqu xmm0, [rsi+rcx] ; Load 16 source bytes
+    movdqa xmm2, xmm0    ; Copy for the comparison
+    pcmpeqb xmm2, xmm1   ; 0xFF where a byte is the terminator
+    pmovmskb eax, xmm2   ; Collapse the byte mask into eax
+    test eax, eax        ; Any terminator in this block?
+    jnz .copy_tail       ; Yes: finish byte by byte
+    movdqu [rdi+rcx], xmm0 ; Store the full 16-byte block
+    add rcx, 16          ; Advance past the block
+    jmp .copy_loop       ; Continue loop
+    .copy_tail:
+    mov al, [rsi+rcx]    ; Load byte from source
+    mov [rdi+rcx], al    ; Store byte to destination
+    inc rcx              ; Increment counter
+    test al, al          ; Check for null terminator
+    jnz .copy_tail       ; Continue if not null
+    dec rcx              ; Don't count null terminator
+    mov rax, rcx         ; Return length
+    ret
+""",
+    "flush_stdout": """\
+
+; Helper to write all pending console output in one WriteConsoleA call
+_flush_stdout:
+    mov rcx, [out_pos]        ; Anything pending?
+    test rcx, rcx
+    jz .flush_done
+    mov rcx, STD_OUTPUT_HANDLE ; First argument: handle type (stdout)
+    sub rsp, 32               ; Shadow space for Win64 calling convention
+    call GetStdHandle         ; Get handle to stdout
+    add rsp, 32               ; Restore stack
+    mov rcx, rax              ; First argument: handle to stdout
+    mov rdx, stdout_buffer    ; Second argument: pending output
+    mov r8, [out_pos]         ; Third argument: pending length
+    lea r9, [chars_written]   ; Fourth argument: pointer to chars_written
+    push 0                    ; Fifth argument: reserved (NULL)
+    sub rsp, 32               ; Shadow space for Win64 calling convention
+    call WriteConsoleA        ; Call WriteConsoleA
+    add rsp, 40               ; Restore stack (32 + 8 for the push)
+    mov qword [out_pos], 0    ; Buffer is empty again
+    .flush_done:
+    ret
+""",
+}
+
 class CodeGen:
     def __init__(self, ast: ProgramNode):
         self.ast = ast
-        self.output = []
+        self.output = io.StringIO()
+        # os.name never changes within a process; check it once instead of
+        # per emitted function/statement
+        self._is_windows = os.name == 'nt'
+
         self.current_function = None
         self.local_vars = {}
-        self.stack_offset = 0
         self.string_literals = {}
+        self.string_value_to_id = {}
         self.string_literal_count = 0
+        self._at_function_tail = False
     
     def generate(self) -> str:
         """Generate assembly code from the AST."""
+        self._pre_analyze()
         self._emit_header()
         
         # Generate code for each function
@@ -37,12 +235,23 @@ class CodeGen:
         # Generate helper functions
         self._generate_helper_functions()
         
-        return "\n".join(self.output)
+        return self.output.getvalue()
     
     def _emit(self, line: str):
         """Add a line to the output."""
-        self.output.append(line)
+        self.output.write(line)
+        self.output.write("\n")
     
+    def _pre_analyze(self):
+        """Collect everything the emitters need in one pass over the AST.
+
+        Sets _has_main and _function_index and gathers the string literals,
+        so _emit_header doesn't rescan the function list.
+        """
+        self._function_index = {func.name: func for func in self.ast.functions}
+        self._has_main = "main" in self._function_index
+        self._collect_string_literals(self.ast)
+
     def _emit_header(self):
         """Emit assembly header."""
         self._emit("; Blitz compiler output")
@@ -51,15 +260,13 @@ class CodeGen:
         self._emit("")
         
         # Check if we're on Windows
-        is_windows = os.name == 'nt'
+        is_windows = self._is_windows
         
         if is_windows:
             # Windows-specific header
             self._emit("section .text")
             
-            # Check if we have a main function to set as the entry point
-            has_main = any(func.name == "main" for func in self.ast.functions)
-            if has_main:
+            if self._has_main:
                 self._emit("global main")
                 self._emit("extern GetStdHandle   ; Windows API function")
                 self._emit("extern WriteConsoleA   ; Windows API function")
@@ -72,17 +279,24 @@ class CodeGen:
                 self._emit("    digit_buffer db '0123456789', 0  ; Buffer for converting digits")
                 self._emit("    output_buffer times 256 db 0  ; Buffer for output")
                 self._emit("    newline db 13, 10  ; CRLF newline for Windows")
+                pairs = "".join(f"{n:02d}" for n in range(100))
+                self._emit(f"    digit_pairs db \"{pairs}\"  ; All two-digit pairs for int formatting")
                 self._emit("    STD_OUTPUT_HANDLE equ -11  ; Windows constant for stdout")
                 self._emit("    chars_written dq 0        ; Used by WriteConsoleA")
+                self._emit("    stdout_buffer times 4096 db 0  ; Pending console output")
+                self._emit("    out_pos dq 0              ; Bytes pending in stdout_buffer")
                 
-                # Process the AST to find all string literals
-                self._collect_string_literals(self.ast)
-                
-                # Emit string literals
+                # Emit string literals (collected during pre-analysis)
                 for string_id, string_value in self.string_literals.items():
                     escaped_value = string_value.replace('\\', '\\\\').replace('"', '\\"')
                     self._emit(f"    {string_id} db \"{escaped_value}\", 0  ; String literal")
                 
+                # The SSE strlen and _string_copy loops read 16 bytes at a
+                # time and may overrun a terminator by up to 15 bytes; pad
+                # the end of the section so a literal ending near the last
+                # mapped page can never fault
+                self._emit("    times 16 db 0  ; Overread padding for the 16-byte SSE loops")
+                
                 self._emit("")
                 self._emit("section .text  ; Back to text section")
             else:
@@ -91,9 +305,7 @@ class CodeGen:
             # Linux-specific header
             self._emit("section .text")
             
-            # Check if we have a main function to set as the entry point
-            has_main = any(func.name == "main" for func in self.ast.functions)
-            if has_main:
+            if self._has_main:
                 self._emit("global main")
             else:
                 self._emit("; Warning: No main function found")
@@ -102,40 +314,72 @@ class CodeGen:
         """Generate code for a function."""
         self.current_function = function.name
         self.local_vars = {}
-        self.stack_offset = 0
+        self._epilogue_label = f".Lf_{function.name}_epilogue"
         
-        # Function label
-        self._emit("")
-        self._emit(f"{function.name}:")
+        # Assign every local its stack slot up front (the grammar has no
+        # nested blocks), 8-byte slots first so same-size variables sit
+        # adjacent and aligned; the emission phase below just reads the
+        # precomputed offsets, and the frame size is final from the start
+        declarations = [stmt for stmt in function.body
+                        if isinstance(stmt, DeclarationNode)]
+        declarations.sort(key=lambda decl: decl.type == "i32")
         
-        # Function prologue
-        self._emit("    push rbp")
-        self._emit("    mov rbp, rsp")
+        frame_size = 0
+        self._var_slots = {}
+        for decl in declarations:
+            var_size = 4 if decl.type == "i32" else 8
+            frame_size += var_size
+            self._var_slots[id(decl)] = {"offset": -frame_size, "size": var_size}
+
+        # Leaf functions with no locals get no frame at all: just the
+        # label, and a bare ret in the epilogue
+        self._function_has_frame = frame_size > 0 or self._needs_stack_frame(function)
         
-        # Reserve stack space for local variables (will be adjusted later)
-        self._emit("    sub rsp, 0")  # Placeholder
+        if self._function_has_frame:
+            # Function label and prologue, with the stack reservation
+            # aligned to 16 bytes, emitted as one write
+            aligned_offset = (frame_size + 15) & ~15
+            self.output.write(_TEMPLATES["prologue"]
+                              .replace("__NAME__", function.name)
+                              .replace("__FRAME__", str(aligned_offset)))
+        else:
+            self.output.write(f"\n{function.name}:\n")
         
         # Generate code for function body
         for statement in function.body:
+            self._at_function_tail = statement is function.body[-1]
             self._generate_statement(statement)
         
-        # Function epilogue (if not already returned)
+        # Shared epilogue: returns in the body jump here instead of each
+        # duplicating the teardown, and a final return falls through
         if not function.body or not isinstance(function.body[-1], ReturnNode):
             if function.name == "main":
                 self._emit("    mov rax, 0")  # Default return 0 for main
+        self._emit(f"{self._epilogue_label}:")
+        if self._is_windows and function.name == "main" and self._function_has_frame:
+            self._emit("    call _flush_stdout  ; Write any buffered console output")
+        if self._function_has_frame:
             self._emit("    leave")
-            self._emit("    ret")
-        
-        # Update stack space reservation if needed
-        if self.stack_offset > 0:
-            # Find the placeholder and replace it
-            for i, line in enumerate(self.output):
-                if line == "    sub rsp, 0":  # Our placeholder
-                    # Align stack to 16 bytes
-                    aligned_offset = (self.stack_offset + 15) & ~15
-                    self.output[i] = f"    sub rsp, {aligned_offset}"
-                    break
+        self._emit("    ret")
+
     
+    def _needs_stack_frame(self, function: FunctionNode):
+        """Check whether a function's body requires a stack frame.
+
+        Calls and string concatenations both emit call instructions, so any
+        CallNode or StringNode in the body forces the full prologue even
+        when there are no locals.
+        """
+        stack = list(function.body)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (CallNode, StringNode)):
+                return True
+            children = self._COLLECT_CHILDREN.get(type(node))
+            if children:
+                stack.extend(children(node))
+        return False
+
     def _generate_statement(self, statement: ASTNode):
         """Generate code for a statement."""
         if isinstance(statement, ReturnNode):
@@ -154,84 +398,126 @@ class CodeGen:
         self._generate_expression(return_node.expression)
         
         # Check if we're on Windows and in the main function
-        is_windows = os.name == 'nt'
-        if is_windows and self.current_function == "main":
+        if self._is_windows and self.current_function == "main":
             # On Windows, we'll just return normally from main
             # The linker will handle the exit process
             self._emit("    ; Windows: Return from main")
-            self._emit("    leave")
-            self._emit("    ret")
-        else:
-            # Standard return
-            self._emit("    leave")
-            self._emit("    ret")
+        
+        # Branch to the shared epilogue; the last statement of the body
+        # simply falls through to it
+        if not self._at_function_tail:
+            self._emit(f"    jmp {self._epilogue_label}")
     
     def _generate_declaration(self, decl_node: DeclarationNode):
         """Generate code for a variable declaration."""
-        # Allocate space on the stack
-        var_size = 8  # Default to 64-bit (8 bytes)
-        if decl_node.type == "i32":
-            var_size = 4
-        
-        # Align to proper boundary
-        self.stack_offset += var_size
-        
-        # Store variable location
-        self.local_vars[decl_node.name] = {
-            "offset": -self.stack_offset,
-            "size": var_size
-        }
+        # The slot was assigned up front in _generate_function
+        var_info = self._var_slots[id(decl_node)]
+        self.local_vars[decl_node.name] = var_info
         
         # Generate initializer if present
         if decl_node.initializer:
             self._generate_expression(decl_node.initializer)
             
             # Store the result in the variable
-            if var_size == 4:
-                self._emit(f"    mov dword [rbp-{self.stack_offset}], eax")
+            if var_info["size"] == 4:
+                self._emit(f"    mov dword [rbp{var_info['offset']}], eax")
             else:
-                self._emit(f"    mov qword [rbp-{self.stack_offset}], rax")
+                self._emit(f"    mov qword [rbp{var_info['offset']}], rax")
     
-    def _collect_string_literals(self, node):
+    # Child accessors for _collect_string_literals, keyed by node type so
+    # each node costs one dict lookup instead of an isinstance chain
+    _COLLECT_CHILDREN = {
+        ProgramNode: lambda node: node.functions,
+        FunctionNode: lambda node: node.body,
+        ReturnNode: lambda node: (node.expression,),
+        DeclarationNode: lambda node: (node.initializer,) if node.initializer else (),
+        BinaryOpNode: lambda node: (node.left, node.right),
+        CallNode: lambda node: node.arguments,
+    }
+
+    def _collect_string_literals(self, node, visited=None):
         """Recursively collect string literals from the AST."""
-        if isinstance(node, StringNode):
+        if visited is None:
+            visited = set()
+
+        # Walk each node at most once, even if subtrees are shared
+        if id(node) in visited:
+            return
+        visited.add(id(node))
+
+        if type(node) is StringNode:
             # Add string literal to the collection if not already present
-            if node.value not in self.string_literals.values():
+            if node.value not in self.string_value_to_id:
                 string_id = f"str_{self.string_literal_count}"
                 self.string_literals[string_id] = node.value
+                self.string_value_to_id[node.value] = string_id
                 self.string_literal_count += 1
-        
+            return
+
         # Recursively process child nodes
-        if isinstance(node, ProgramNode):
-            for func in node.functions:
-                self._collect_string_literals(func)
-        elif isinstance(node, FunctionNode):
-            for stmt in node.body:
-                self._collect_string_literals(stmt)
-        elif isinstance(node, ReturnNode):
-            self._collect_string_literals(node.expression)
-        elif isinstance(node, DeclarationNode) and node.initializer:
-            self._collect_string_literals(node.initializer)
-        elif isinstance(node, BinaryOpNode):
-            self._collect_string_literals(node.left)
-            self._collect_string_literals(node.right)
-        elif isinstance(node, CallNode):
-            for arg in node.arguments:
-                self._collect_string_literals(arg)
+        children = self._COLLECT_CHILDREN.get(type(node))
+        if children:
+            for child in children(node):
+                self._collect_string_literals(child, visited)
     
     def _get_string_id(self, string_value):
         """Get the ID for a string literal."""
-        for string_id, value in self.string_literals.items():
-            if value == string_value:
-                return string_id
-        return None
+        return self.string_value_to_id.get(string_value)
     
+    def _emit_leaf_operand(self, expr: ASTNode, reg: str):
+        """Load a leaf operand (number or variable) directly into reg."""
+        if isinstance(expr, NumberNode):
+            self._emit(f"    mov {reg}, {expr.value}")
+            return
+        if expr.name not in self.local_vars:
+            raise CodeGenError(f"Undefined variable '{expr.name}'")
+        
+        var_info = self.local_vars[expr.name]
+        if var_info["size"] == 4:
+            reg32 = {"rax": "eax", "rcx": "ecx"}[reg]
+            self._emit(f"    mov {reg32}, dword [rbp{var_info['offset']}]")
+        else:
+            self._emit(f"    mov {reg}, qword [rbp{var_info['offset']}]")
+
+    def _try_fold(self, expr: ASTNode):
+        """Return the compile-time value of an all-constant expression.
+
+        Recurses through BinaryOpNode trees whose leaves are all NumberNodes
+        and evaluates them here, so no runtime arithmetic is emitted at all.
+        Returns None when any leaf is not a constant.
+        """
+        if isinstance(expr, NumberNode):
+            return expr.value
+        if isinstance(expr, BinaryOpNode):
+            left = self._try_fold(expr.left)
+            if left is None:
+                return None
+            right = self._try_fold(expr.right)
+            if right is None:
+                return None
+            if expr.operator == TokenType.PLUS:
+                return left + right
+            if expr.operator == TokenType.MINUS:
+                return left - right
+            if expr.operator == TokenType.STAR:
+                return left * right
+            if expr.operator == TokenType.SLASH and right != 0:
+                # Match idiv, which truncates toward zero (Python's // floors)
+                quotient = abs(left) // abs(right)
+                return -quotient if (left < 0) != (right < 0) else quotient
+        return None
+
     def _generate_expression(self, expr: ASTNode):
         """Generate code for an expression."""
         if isinstance(expr, NumberNode):
             self._emit(f"    mov rax, {expr.value}")
         
         elif isinstance(expr, StringNode):
+            # String data and the console helpers are only emitted on the
+            # Windows path; fail loudly rather than reference symbols the
+            # POSIX output never defines
+            if not self._is_windows:
+                raise CodeGenError("String literals are only supported on Windows")
             # Get the ID for this string literal
             string_id = self._get_string_id(expr.value)
             if string_id:
@@ -263,16 +549,34 @@ class CodeGen:
             if expr.operator == TokenType.PLUS and (isinstance(expr.left, StringNode) or isinstance(expr.right, StringNode)):
                 self._generate_string_concat(expr)
             else:
+                # Fold all-constant subtrees into a single immediate
+                folded = self._try_fold(expr)
+                if folded is not None:
+                    self._emit(f"    mov rax, {folded}")
+                    return
+
                 # Regular numeric operation
-                # Generate right operand first (to handle nested expressions correctly)
-                self._generate_expression(expr.right)
-                self._emit("    push rax")  # Save right operand
-                
-                # Generate left operand
-                self._generate_expression(expr.left)
-                
-                # Right operand is on the stack
-                self._emit("    pop rcx")  # Get right operand
+                if isinstance(expr.right, (NumberNode, VariableNode)):
+                    # Leaf right operand: compute the left side into rax and
+                    # load the leaf straight into rcx, skipping the push/pop
+                    self._generate_expression(expr.left)
+                    self._emit_leaf_operand(expr.right, "rcx")
+                elif isinstance(expr.left, (NumberNode, VariableNode)):
+                    # Leaf left operand: compute the right side into rax,
+                    # move it aside, then load the leaf
+                    self._generate_expression(expr.right)
+                    self._emit("    mov rcx, rax")
+                    self._emit_leaf_operand(expr.left, "rax")
+                else:
+                    # Generate right operand first (to handle nested expressions correctly)
+                    self._generate_expression(expr.right)
+                    self._emit("    push rax")  # Save right operand
+                    
+                    # Generate left operand
+                    self._generate_expression(expr.left)
+                    
+                    # Right operand is on the stack
+                    self._emit("    pop rcx")  # Get right operand
                 
                 # Perform operation
                 if expr.operator == TokenType.PLUS:
@@ -293,146 +597,89 @@ class CodeGen:
     # Counter for generating unique labels
     _label_counter = 0
     
+    def _next_label_id(self):
+        """Return a fresh numeric suffix for template label substitution."""
+        label_id = str(self._label_counter)
+        self._label_counter += 1
+        return label_id
+
     def _generate_unique_label(self, base_name):
         """Generate a unique label name."""
-        label = f"{base_name}_{self._label_counter}"
-        self._label_counter += 1
-        return label
+        return f"{base_name}_{self._next_label_id()}"
     
+    def _emit_number_to_string(self, save_value, advance):
+        """Emit the number-to-decimal-ASCII conversion used by concatenation.
+
+        Converts the value in rax via the shared digit buffer and copies the
+        result to the output buffer at rdi. With save_value the original rax
+        is preserved across the conversion; with advance rdi is moved past
+        the copied digits.
+        """
+        if save_value:
+            self._emit("    mov r10, rax         ; Save variable value temporarily")
+
+        self.output.write(_TEMPLATES["num2str"].replace("__ID__", self._next_label_id()))
+        if advance:
+            self._emit("    add rdi, rax         ; Move buffer pointer")
+
+        if save_value:
+            self._emit("    mov rax, r10         ; Restore original value")
+
+    def _emit_constant_string(self, text, advance):
+        """Store a compile-time-known string into the output buffer.
+
+        Emits direct byte stores instead of a runtime digit loop and
+        _string_copy call. With advance rdi is moved past the stored bytes.
+        """
+        for i, ch in enumerate(text):
+            self._emit(f"    mov byte [rdi+{i}], {ord(ch)} ; '{ch}'")
+        if advance:
+            self._emit(f"    add rdi, {len(text)}")
+
     def _generate_string_concat(self, expr: BinaryOpNode):
         """Generate code for string concatenation."""
         # For simplicity, we'll just store the concatenated string in the output buffer
         self._emit("    ; String concatenation")
         self._emit("    mov rdi, output_buffer  ; Destination buffer")
         
-        # Generate left operand (could be string or number)
-        self._generate_expression(expr.left)
+        # Constant numeric operands are formatted here at compile time
+        left_folded = self._try_fold(expr.left)
         
-        # If left operand is a string, copy it to the output buffer
-        if isinstance(expr.left, StringNode):
+        if left_folded is not None:
+            self._emit_constant_string(str(left_folded), advance=True)
+        elif isinstance(expr.left, StringNode):
+            self._generate_expression(expr.left)
             self._emit("    mov rsi, rax         ; Source string")
             self._emit("    call _string_copy    ; Copy string to buffer")
             self._emit("    add rdi, rax         ; Move buffer pointer")
         elif isinstance(expr.left, VariableNode):
             # Handle variable - need to check if it's a number or string
             # For now, we'll assume it's a number and convert it to string
-            num_loop_label = self._generate_unique_label("num_to_str_loop")
-            
-            # Save the current value (which is in rax) to a temporary register
-            self._emit("    mov r10, rax         ; Save variable value temporarily")
-            
-            self._emit("    push rdi             ; Save buffer pointer")
-            self._emit("    mov rcx, 10          ; Base 10")
-            self._emit("    mov rbx, digit_buffer ; Use digit buffer")
-            self._emit("    add rbx, 10          ; Start at end of buffer")
-            self._emit("    mov byte [rbx], 0    ; Null terminator")
-            
-            # Division loop to convert number to string
-            self._emit(f"    {num_loop_label}:")
-            self._emit("    xor rdx, rdx         ; Clear rdx for division")
-            self._emit("    div rcx              ; rax / 10, remainder in rdx")
-            self._emit("    add dl, '0'          ; Convert to ASCII")
-            self._emit("    dec rbx              ; Move back one byte")
-            self._emit("    mov [rbx], dl        ; Store digit")
-            self._emit("    test rax, rax        ; Check if done")
-            self._emit(f"    jnz {num_loop_label} ; Continue if not zero")
-            
-            # Copy the number string to the output buffer
-            self._emit("    pop rdi              ; Restore buffer pointer")
-            self._emit("    mov rsi, rbx         ; Source string")
-            self._emit("    call _string_copy    ; Copy string to buffer")
-            self._emit("    add rdi, rax         ; Move buffer pointer")
-            
-            # Restore the original value
-            self._emit("    mov rax, r10         ; Restore original value")
+            self._generate_expression(expr.left)
+            self._emit_number_to_string(save_value=True, advance=True)
         else:
             # If left operand is a number, convert it to string
-            num_loop_label = self._generate_unique_label("num_to_str_loop")
-            
-            self._emit("    push rdi             ; Save buffer pointer")
-            self._emit("    mov rcx, 10          ; Base 10")
-            self._emit("    mov rbx, digit_buffer ; Use digit buffer")
-            self._emit("    add rbx, 10          ; Start at end of buffer")
-            self._emit("    mov byte [rbx], 0    ; Null terminator")
-            
-            # Division loop to convert number to string
-            self._emit(f"    {num_loop_label}:")
-            self._emit("    xor rdx, rdx         ; Clear rdx for division")
-            self._emit("    div rcx              ; rax / 10, remainder in rdx")
-            self._emit("    add dl, '0'          ; Convert to ASCII")
-            self._emit("    dec rbx              ; Move back one byte")
-            self._emit("    mov [rbx], dl        ; Store digit")
-            self._emit("    test rax, rax        ; Check if done")
-            self._emit(f"    jnz {num_loop_label} ; Continue if not zero")
-            
-            # Copy the number string to the output buffer
-            self._emit("    pop rdi              ; Restore buffer pointer")
-            self._emit("    mov rsi, rbx         ; Source string")
-            self._emit("    call _string_copy    ; Copy string to buffer")
-            self._emit("    add rdi, rax         ; Move buffer pointer")
+            self._generate_expression(expr.left)
+            self._emit_number_to_string(save_value=False, advance=True)
         
         # Generate right operand (could be string or number)
-        self._generate_expression(expr.right)
+        right_folded = self._try_fold(expr.right)
         
-        # If right operand is a string, copy it to the output buffer
-        if isinstance(expr.right, StringNode):
+        if right_folded is not None:
+            self._emit_constant_string(str(right_folded), advance=False)
+        elif isinstance(expr.right, StringNode):
+            self._generate_expression(expr.right)
             self._emit("    mov rsi, rax         ; Source string")
             self._emit("    call _string_copy    ; Copy string to buffer")
         elif isinstance(expr.right, VariableNode):
             # Handle variable - need to check if it's a number or string
             # For now, we'll assume it's a number and convert it to string
-            num_loop_label = self._generate_unique_label("num_to_str_loop")
-            
-            # Save the current value (which is in rax) to a temporary register
-            self._emit("    mov r10, rax         ; Save variable value temporarily")
-            
-            self._emit("    push rdi             ; Save buffer pointer")
-            self._emit("    mov rcx, 10          ; Base 10")
-            self._emit("    mov rbx, digit_buffer ; Use digit buffer")
-            self._emit("    add rbx, 10          ; Start at end of buffer")
-            self._emit("    mov byte [rbx], 0    ; Null terminator")
-            
-            # Division loop to convert number to string
-            self._emit(f"    {num_loop_label}:")
-            self._emit("    xor rdx, rdx         ; Clear rdx for division")
-            self._emit("    div rcx              ; rax / 10, remainder in rdx")
-            self._emit("    add dl, '0'          ; Convert to ASCII")
-            self._emit("    dec rbx              ; Move back one byte")
-            self._emit("    mov [rbx], dl        ; Store digit")
-            self._emit("    test rax, rax        ; Check if done")
-            self._emit(f"    jnz {num_loop_label} ; Continue if not zero")
-            
-            # Copy the number string to the output buffer
-            self._emit("    pop rdi              ; Restore buffer pointer")
-            self._emit("    mov rsi, rbx         ; Source string")
-            self._emit("    call _string_copy    ; Copy string to buffer")
-            
-            # Restore the original value
-            self._emit("    mov rax, r10         ; Restore original value")
+            self._generate_expression(expr.right)
+            self._emit_number_to_string(save_value=True, advance=False)
         else:
             # If right operand is a number, convert it to string
-            num_loop_label = self._generate_unique_label("num_to_str_loop")
-            
-            self._emit("    push rdi             ; Save buffer pointer")
-            self._emit("    mov rcx, 10          ; Base 10")
-            self._emit("    mov rbx, digit_buffer ; Use digit buffer")
-            self._emit("    add rbx, 10          ; Start at end of buffer")
-            self._emit("    mov byte [rbx], 0    ; Null terminator")
-            
-            # Division loop to convert number to string
-            self._emit(f"    {num_loop_label}:")
-            self._emit("    xor rdx, rdx         ; Clear rdx for division")
-            self._emit("    div rcx              ; rax / 10, remainder in rdx")
-            self._emit("    add dl, '0'          ; Convert to ASCII")
-            self._emit("    dec rbx              ; Move back one byte")
-            self._emit("    mov [rbx], dl        ; Store digit")
-            self._emit("    test rax, rax        ; Check if done")
-            self._emit(f"    jnz {num_loop_label} ; Continue if not zero")
-            
-            # Copy the number string to the output buffer
-            self._emit("    pop rdi              ; Restore buffer pointer")
-            self._emit("    mov rsi, rbx         ; Source string")
-            self._emit("    call _string_copy    ; Copy string to buffer")
+            self._generate_expression(expr.right)
+            self._emit_number_to_string(save_value=False, advance=False)
         
         # Return the address of the output buffer
         self._emit("    mov rax, output_buffer  ; Return address of output buffer")
@@ -446,7 +693,7 @@ class CodeGen:
             raise CodeGenError("printnl requires at least one argument")
         
         # Check if we're on Windows
-        is_windows = os.name == 'nt'
+        is_windows = self._is_windows
         
         # Generate code for the argument
         self._generate_expression(arguments[0])
@@ -456,142 +703,29 @@ class CodeGen:
             isinstance(arguments[0], BinaryOpNode) and 
             (isinstance(arguments[0].left, StringNode) or isinstance(arguments[0].right, StringNode))
         ):
-            # For strings, we've already set up the output buffer in rax
-            # Store 1 in the last_printed_value to indicate success
-            self._emit("    mov dword [last_printed_value], 1  ; Store 1 to indicate success")
-            
-            # Save the string pointer (in rax)
-            self._emit("    ; Save the string pointer")
-            self._emit("    mov rsi, rax              ; Save string pointer in rsi")
-            
-            # Get stdout handle
-            self._emit("    ; Get handle to stdout")
-            self._emit("    mov rcx, STD_OUTPUT_HANDLE ; First argument: handle type (stdout)")
-            self._emit("    sub rsp, 32               ; Shadow space for Win64 calling convention")
-            self._emit("    call GetStdHandle         ; Get handle to stdout")
-            self._emit("    add rsp, 32               ; Restore stack")
-            
-            # Store the handle for later use
-            self._emit("    mov rbx, rax              ; Store handle in rbx")
-            
-            # Calculate string length (find null terminator)
-            self._emit("    ; Calculate string length")
-            self._emit("    mov rdi, rsi              ; String pointer")
-            self._emit("    xor rcx, rcx              ; Counter = 0")
-            self._emit("    .strlen_loop:")
-            self._emit("    cmp byte [rdi+rcx], 0     ; Check for null terminator")
-            self._emit("    je .strlen_done           ; If found, we're done")
-            self._emit("    inc rcx                   ; Increment counter")
-            self._emit("    jmp .strlen_loop          ; Continue loop")
-            self._emit("    .strlen_done:")
-            self._emit("    mov r8, rcx               ; Store length in r8 for WriteConsoleA")
-            
-            # Call WriteConsoleA to print the string
-            self._emit("    ; Print the string")
-            self._emit("    mov rcx, rbx              ; First argument: handle to stdout")
-            self._emit("    mov rdx, rsi              ; Second argument: string to print")
-            self._emit("    ; r8 already contains the string length")
-            self._emit("    lea r9, [chars_written]   ; Fourth argument: pointer to chars_written")
-            self._emit("    push 0                    ; Fifth argument: reserved (NULL)")
-            self._emit("    sub rsp, 32               ; Shadow space for Win64 calling convention")
-            self._emit("    call WriteConsoleA        ; Call WriteConsoleA")
-            self._emit("    add rsp, 40               ; Restore stack (32 + 8 for the push)")
-            
-            # Print a newline
-            self._emit("    ; Print a newline")
-            self._emit("    mov rcx, rbx              ; First argument: handle to stdout")
-            self._emit("    mov rdx, newline          ; Second argument: newline string")
-            self._emit("    mov r8, 2                 ; Third argument: string length (CR+LF = 2 bytes)")
-            self._emit("    lea r9, [chars_written]   ; Fourth argument: pointer to chars_written")
-            self._emit("    push 0                    ; Fifth argument: reserved (NULL)")
-            self._emit("    sub rsp, 32               ; Shadow space for Win64 calling convention")
-            self._emit("    call WriteConsoleA        ; Call WriteConsoleA")
-            self._emit("    add rsp, 40               ; Restore stack (32 + 8 for the push)")
-            
-            # Restore rax to the original string pointer
-            self._emit("    mov rax, rsi              ; Restore string pointer to rax")
+            # For strings, we've already set up the output buffer in rax;
+            # the sequence only varies in its labels, so it goes out as one
+            # write, appending to the pending-output buffer
+            self.output.write(_TEMPLATES["print_string"].replace("__ID__", self._next_label_id()))
         else:
-            # For numbers, store the value in the global variable for inspection
-            self._emit("    mov dword [last_printed_value], eax  ; Store the integer value")
-            
-            # Convert the integer to a string
-            self._emit("    ; Convert integer to string")
-            self._emit("    mov rcx, 10                ; Base 10")
-            self._emit("    mov rbx, output_buffer     ; Use our output buffer")
-            self._emit("    add rbx, 30                ; Start at the end of buffer")
-            self._emit("    mov byte [rbx], 0          ; Null terminator")
-            self._emit("    dec rbx                    ; Move back one byte")
-            
-            # Division loop to convert number to string
-            self._emit("    .int_to_str_loop:")
-            self._emit("    xor rdx, rdx               ; Clear rdx for division")
-            self._emit("    div rcx                    ; rax / 10, remainder in rdx")
-            self._emit("    add dl, '0'                ; Convert to ASCII")
-            self._emit("    mov [rbx], dl              ; Store digit")
-            self._emit("    dec rbx                    ; Move back one byte")
-            self._emit("    test rax, rax              ; Check if done")
-            self._emit("    jnz .int_to_str_loop       ; Continue if not zero")
-            
-            # Calculate string pointer and length
-            self._emit("    inc rbx                    ; Point to first digit")
-            
-            # Get stdout handle
-            self._emit("    ; Print the integer to the console using Windows API")
-            self._emit("    mov rcx, STD_OUTPUT_HANDLE ; First argument: handle type (stdout)")
-            self._emit("    sub rsp, 32               ; Shadow space for Win64 calling convention")
-            self._emit("    call GetStdHandle         ; Get handle to stdout")
-            self._emit("    add rsp, 32               ; Restore stack")
-            
-            # Store the handle for later use
-            self._emit("    mov rsi, rax              ; Store handle in rsi")
-            
-            # Calculate string length
-            self._emit("    mov rdi, rbx              ; String to print")
-            self._emit("    mov rcx, output_buffer")
-            self._emit("    add rcx, 30               ; End of buffer")
-            self._emit("    sub rcx, rdi              ; Calculate length")
-            self._emit("    mov r8, rcx               ; Store length in r8 for WriteConsoleA")
-            
-            # Call WriteConsoleA to print the string
-            self._emit("    mov rcx, rsi              ; First argument: handle to stdout")
-            self._emit("    mov rdx, rdi              ; Second argument: string to print")
-            self._emit("    ; r8 already contains the string length")
-            self._emit("    lea r9, [chars_written]   ; Fourth argument: pointer to chars_written")
-            self._emit("    push 0                    ; Fifth argument: reserved (NULL)")
-            self._emit("    sub rsp, 32               ; Shadow space for Win64 calling convention")
-            self._emit("    call WriteConsoleA        ; Call WriteConsoleA")
-            self._emit("    add rsp, 40               ; Restore stack (32 + 8 for the push)")
-            
-            # Print a newline
-            self._emit("    ; Print a newline")
-            self._emit("    mov rcx, rsi              ; First argument: handle to stdout")
-            self._emit("    mov rdx, newline          ; Second argument: newline string")
-            self._emit("    mov r8, 2                 ; Third argument: string length (CR+LF = 2 bytes)")
-            self._emit("    lea r9, [chars_written]   ; Fourth argument: pointer to chars_written")
-            self._emit("    push 0                    ; Fifth argument: reserved (NULL)")
-            self._emit("    sub rsp, 32               ; Shadow space for Win64 calling convention")
-            self._emit("    call WriteConsoleA        ; Call WriteConsoleA")
-            self._emit("    add rsp, 40               ; Restore stack (32 + 8 for the push)")
+            # For numbers, convert to decimal and append to the
+            # pending-output buffer; one write suffices
+            self.output.write(_TEMPLATES["print_int"].replace("__ID__", self._next_label_id()))
         
         # Return the value in rax
         self._emit("    mov eax, dword [last_printed_value]  ; Return the value")
     
     def _generate_helper_functions(self):
         """Generate helper functions used by the generated code."""
-        # String copy function
-        self._emit("")
-        self._emit("; Helper function to copy a string")
-        self._emit("_string_copy:")
-        self._emit("    xor rcx, rcx         ; Clear counter")
-        self._emit("    .copy_loop:")
-        self._emit("    mov al, [rsi+rcx]    ; Load byte from source")
-        self._emit("    mov [rdi+rcx], al    ; Store byte to destination")
-        self._emit("    inc rcx              ; Increment counter")
-        self._emit("    test al, al          ; Check for null terminator")
-        self._emit("    jnz .copy_loop       ; Continue if not null")
-        self._emit("    dec rcx              ; Don't count null terminator")
-        self._emit("    mov rax, rcx         ; Return length")
-        self._emit("    ret")
+        # String copy function; moves 16 bytes per iteration with SSE2,
+        # falling back to a byte loop only for the block holding the
+        # terminator. Returns the length (excluding the null) in rax.
+        self.output.write(_TEMPLATES["string_copy"])
+        
+        # The console-output flush helper references the Windows API and
+        # the Windows-only data section
+        if self._is_windows and self._has_main:
+            self.output.write(_TEMPLATES["flush_stdout"])
     
     def _peek_value_if_constant(self, expr: ASTNode) -> str:
         """Try to peek at the value of an expression if it's a constant."""
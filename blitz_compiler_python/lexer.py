@@ -1,10 +1,14 @@
+# cython: language_level=3, infer_types=True
 """
 Lexer for the Blitz programming language.
 Converts source code into a stream of tokens for parsing.
 """
 
+import re
+import sys
+from bisect import bisect_right
+from collections import namedtuple
 from enum import Enum, auto
-from dataclasses import dataclass
 from typing import List, Optional
 
 class TokenType(Enum):
@@ -41,211 +45,252 @@ class TokenType(Enum):
     # Special
     EOF = auto()
 
-@dataclass
-class Token:
-    type: TokenType
-    value: str
-    line: int
-    column: int
-    
-    def __repr__(self):
-        return f"Token({self.type}, '{self.value}', line={self.line}, col={self.column})"
+# A single lexical token. A namedtuple rather than a hand-written class:
+# construction is one C-level tuple allocation and equality/repr come
+# C-implemented for free, which matters at one Token per lexeme.
+Token = namedtuple('Token', ('type', 'value', 'line', 'column'))
 
 class LexerError(Exception):
     """Exception raised for errors during lexical analysis."""
     pass
 
+# Module-level aliases for the token types the scan loop emits per token.
+# Loading a module global is one dict lookup cheaper than the attribute
+# load on the enum class, and it adds up at one or more per token.
+NUMBER = TokenType.NUMBER
+IDENTIFIER = TokenType.IDENTIFIER
+STRING = TokenType.STRING
+ARROW = TokenType.ARROW
+MINUS = TokenType.MINUS
+SLASH = TokenType.SLASH
+EOF = TokenType.EOF
+
+# Keyword tables, built once and shared by every Lexer instance. The
+# packed form maps each keyword's little-endian byte value to its type:
+# every keyword fits in 8 bytes, so a short identifier resolves with one
+# int build and one dict probe instead of hashing its text, and
+# differing lengths can never collide (identifiers contain no NUL
+# bytes).
+_KEYWORDS = {
+    'fn': TokenType.FN,
+    'return': TokenType.RETURN,
+    'let': TokenType.LET,
+    'i32': TokenType.I32,
+    'i64': TokenType.I64,
+}
+_KW_PACKED = {
+    int.from_bytes(word.encode(), 'little'): token_type
+    for word, token_type in _KEYWORDS.items()
+}
+
+# Tokens produced directly from a single character, keyed by byte value so
+# the scan loop never has to materialize a 1-char str to look them up
+_SINGLE_CHAR_TOKENS = {
+    ord('('): (TokenType.LPAREN, '('),
+    ord(')'): (TokenType.RPAREN, ')'),
+    ord('{'): (TokenType.LBRACE, '{'),
+    ord('}'): (TokenType.RBRACE, '}'),
+    ord(';'): (TokenType.SEMICOLON, ';'),
+    ord('='): (TokenType.EQUALS, '='),
+    ord(','): (TokenType.COMMA, ','),
+    ord('+'): (TokenType.PLUS, '+'),
+    ord('*'): (TokenType.STAR, '*'),
+}
+
+# Character classes for the tokenize dispatch table: every byte is
+# classified once up front so the main loop does a single table lookup per
+# character instead of an elif chain of str-method calls
+_CLS_OTHER = 0
+_CLS_SPACE = 1
+_CLS_IDENT = 2
+_CLS_DIGIT = 3
+_CLS_QUOTE = 4
+_CLS_SLASH = 5
+_CLS_MINUS = 6
+_CLS_PUNCT = 7
+
+def _build_char_classes() -> bytearray:
+    """Build the 256-entry character class table."""
+    cls = bytearray(256)
+    for code in range(256):
+        if chr(code).isalpha():
+            cls[code] = _CLS_IDENT
+    for char in ' \t\r\n\v\f':
+        cls[ord(char)] = _CLS_SPACE
+    cls[ord('_')] = _CLS_IDENT
+    for char in '0123456789':
+        cls[ord(char)] = _CLS_DIGIT
+    cls[ord('"')] = _CLS_QUOTE
+    cls[ord('/')] = _CLS_SLASH
+    cls[ord('-')] = _CLS_MINUS
+    for code in _SINGLE_CHAR_TOKENS:
+        cls[code] = _CLS_PUNCT
+    return cls
+
+_CHAR_CLASS = _build_char_classes()
+
+# Bulk scanners: one C-level regex match absorbs a whole run of characters
+# that the helpers previously consumed one at a time in Python
+_RE_IDENT = re.compile(r'[^\W\d]\w*')
+_RE_NUM = re.compile(r'[0-9]+')
+_RE_WS = re.compile(r'[ \t\r\n\v\f]+')
+_RE_STRBODY = re.compile(r'(?:\\.|[^"\\\n])*', re.DOTALL)
+
 class Lexer:
     def __init__(self, source: str):
         self.source = source
         self.pos = 0
-        self.line = 1
-        self.column = 1
         self.tokens = []
+        self.cls = _CHAR_CLASS
+        # Offsets of every line start, found once with C-level find().
+        # The scan loop then tracks only pos; line/column are derived by
+        # bisecting this array when a token or error is emitted, instead
+        # of being maintained per character.
+        starts = [0]
+        find = source.find
+        newline = find('\n')
+        while newline != -1:
+            starts.append(newline + 1)
+            newline = find('\n', newline + 1)
+        self._line_starts = starts
+        # Parallel byte buffer for classification: indexing bytes yields an
+        # int, so the scan loop allocates no 1-char strings. Latin-1 keeps
+        # indices aligned with the str; anything outside maps to '?', which
+        # classifies as OTHER and falls back to the str below.
+        self.codes = source.encode('latin-1', 'replace')
         
-        # Define keywords
-        self.keywords = {
-            'fn': TokenType.FN,
-            'return': TokenType.RETURN,
-            'let': TokenType.LET,
-            'i32': TokenType.I32,
-            'i64': TokenType.I64,
-        }
+        # Shared module-level keyword table
+        self.keywords = _KEYWORDS
+    
+    def _location(self, pos):
+        """Resolve a source offset to a 1-based (line, column) pair."""
+        i = bisect_right(self._line_starts, pos) - 1
+        return i + 1, pos - self._line_starts[i] + 1
     
     def tokenize(self) -> List[Token]:
         """Convert source code into a list of tokens."""
-        while self.pos < len(self.source):
-            # Skip whitespace
-            if self.source[self.pos].isspace():
+        self.tokens = list(self.iter_tokens())
+        return self.tokens
+    
+    def iter_tokens(self):
+        """Yield tokens one at a time without materializing a list.
+        
+        The parser pulls from this generator directly, so for a plain
+        compile no full token list is ever built; tokenize() wraps it for
+        callers that do want the list.
+        """
+        source = self.source
+        codes = self.codes
+        length = len(source)
+        cls = self.cls
+
+        while self.pos < length:
+            kind = cls[codes[self.pos]]
+            # Non-Latin-1 characters classify as OTHER via the '?' stand-in;
+            # only letters are meaningful there (identifier heads)
+            if kind == _CLS_OTHER and source[self.pos].isalpha():
+                kind = _CLS_IDENT
+
+            if kind == _CLS_SPACE:
                 self._skip_whitespace()
                 continue
-            
-            # Skip comments
-            if self.pos + 1 < len(self.source):
-                if self.source[self.pos:self.pos+2] == '//':
+
+            if kind == _CLS_SLASH:
+                # Could be a comment or a division operator
+                if source.startswith('//', self.pos):
                     self._skip_line_comment()
                     continue
-                elif self.source[self.pos:self.pos+2] == '/*':
+                if source.startswith('/*', self.pos):
                     self._skip_block_comment()
                     continue
-            
-            # Check for tokens
-            current_char = self.source[self.pos]
-            
-            if current_char.isalpha() or current_char == '_':
-                self._tokenize_identifier()
-            elif current_char.isdigit():
-                self._tokenize_number()
-            elif current_char == '"':
-                self._tokenize_string()
-            elif current_char == '(':
-                self._add_token(TokenType.LPAREN, current_char)
-            elif current_char == ')':
-                self._add_token(TokenType.RPAREN, current_char)
-            elif current_char == '{':
-                self._add_token(TokenType.LBRACE, current_char)
-            elif current_char == '}':
-                self._add_token(TokenType.RBRACE, current_char)
-            elif current_char == ';':
-                self._add_token(TokenType.SEMICOLON, current_char)
-            elif current_char == '=':
-                self._add_token(TokenType.EQUALS, current_char)
-            elif current_char == ',':
-                self._add_token(TokenType.COMMA, current_char)
-            elif current_char == '+':
-                self._add_token(TokenType.PLUS, current_char)
-            elif current_char == '-':
+                yield Token(SLASH, '/', *self._location(self.pos))
+                self.pos += 1
+            elif kind == _CLS_IDENT:
+                yield self._tokenize_identifier()
+            elif kind == _CLS_DIGIT:
+                yield self._tokenize_number()
+            elif kind == _CLS_PUNCT:
+                token_type, value = _SINGLE_CHAR_TOKENS[codes[self.pos]]
+                yield Token(token_type, value, *self._location(self.pos))
+                self.pos += 1
+            elif kind == _CLS_QUOTE:
+                yield self._tokenize_string()
+            elif kind == _CLS_MINUS:
                 # Check for arrow token
-                if self.pos + 1 < len(self.source) and self.source[self.pos + 1] == '>':
-                    self._add_token(TokenType.ARROW, '->')
-                    self.pos += 1  # Skip the next character
+                if self.pos + 1 < length and codes[self.pos + 1] == 0x3E:  # '>'
+                    yield Token(ARROW, '->', *self._location(self.pos))
+                    self.pos += 2
                 else:
-                    self._add_token(TokenType.MINUS, current_char)
-            elif current_char == '*':
-                self._add_token(TokenType.STAR, current_char)
-            elif current_char == '/':
-                self._add_token(TokenType.SLASH, current_char)
+                    yield Token(MINUS, '-', *self._location(self.pos))
+                    self.pos += 1
             else:
-                raise LexerError(f"Unexpected character '{current_char}' at line {self.line}, column {self.column}")
-            
-            # Move to next character
-            self._advance()
+                line, column = self._location(self.pos)
+                raise LexerError(f"Unexpected character '{source[self.pos]}' at line {line}, column {column}")
         
-        # Add EOF token
-        self._add_token(TokenType.EOF, "")
-        
-        return self.tokens
-    
-    def _add_token(self, token_type: TokenType, value: str):
-        """Add a token to the token list."""
-        self.tokens.append(Token(token_type, value, self.line, self.column - len(value)))
-    
-    def _advance(self):
-        """Move to the next character in the source."""
-        self.pos += 1
-        self.column += 1
+        # Emit EOF token
+        yield Token(EOF, "", *self._location(self.pos))
     
     def _skip_whitespace(self):
         """Skip whitespace characters."""
-        while self.pos < len(self.source) and self.source[self.pos].isspace():
-            if self.source[self.pos] == '\n':
-                self.line += 1
-                self.column = 1
-            else:
-                self.column += 1
-            self.pos += 1
+        self.pos = _RE_WS.match(self.source, self.pos).end()
     
     def _skip_line_comment(self):
         """Skip a line comment (// ...)."""
-        while self.pos < len(self.source) and self.source[self.pos] != '\n':
-            self.pos += 1
-            self.column += 1
+        # find() runs at memchr speed; the comment ends at the newline or
+        # end of input
+        end = self.source.find('\n', self.pos)
+        self.pos = end if end != -1 else len(self.source)
     
     def _skip_block_comment(self):
         """Skip a block comment (/* ... */)."""
-        self.pos += 2  # Skip /*
-        self.column += 2
-        
-        while self.pos < len(self.source):
-            if self.source[self.pos] == '*' and self.pos + 1 < len(self.source) and self.source[self.pos + 1] == '/':
-                self.pos += 2  # Skip */
-                self.column += 2
-                return
-            
-            if self.source[self.pos] == '\n':
-                self.line += 1
-                self.column = 1
-            else:
-                self.column += 1
-            
-            self.pos += 1
-        
-        raise LexerError("Unterminated block comment")
+        end = self.source.find('*/', self.pos + 2)
+        if end == -1:
+            raise LexerError("Unterminated block comment")
+        self.pos = end + 2
     
     def _tokenize_identifier(self):
         """Tokenize an identifier or keyword."""
-        start_pos = self.pos
+        # Grab the whole identifier in one match; interned so repeated
+        # identifiers share one string object and parser comparisons hit
+        # the pointer-equality fast path
+        start = self.pos
+        text = sys.intern(_RE_IDENT.match(self.source, start).group())
+        self.pos += len(text)
         
-        while self.pos < len(self.source) and (self.source[self.pos].isalnum() or self.source[self.pos] == '_'):
-            self.pos += 1
-            self.column += 1
+        # Keyword check on the packed byte slice; longer identifiers can
+        # never be keywords. Non-Latin-1 characters appear as '?' in
+        # codes, which no keyword contains, so they miss harmlessly.
+        if len(text) <= 8:
+            token_type = _KW_PACKED.get(
+                int.from_bytes(self.codes[start:self.pos], 'little'),
+                IDENTIFIER)
+        else:
+            token_type = IDENTIFIER
         
-        # Get the identifier text
-        text = self.source[start_pos:self.pos]
-        
-        # Check if it's a keyword
-        token_type = self.keywords.get(text, TokenType.IDENTIFIER)
-        
-        # Add the token and adjust position
-        self._add_token(token_type, text)
-        self.pos -= 1  # Adjust for the _advance() call that follows
-        self.column -= 1
+        return Token(token_type, text, *self._location(start))
     
     def _tokenize_number(self):
         """Tokenize a number literal."""
-        start_pos = self.pos
-        
-        while self.pos < len(self.source) and self.source[self.pos].isdigit():
-            self.pos += 1
-            self.column += 1
-        
-        # Get the number text
-        text = self.source[start_pos:self.pos]
+        # Grab the whole digit run in one match
+        start = self.pos
+        text = _RE_NUM.match(self.source, start).group()
+        self.pos += len(text)
         
-        # Add the token and adjust position
-        self._add_token(TokenType.NUMBER, text)
-        self.pos -= 1  # Adjust for the _advance() call that follows
-        self.column -= 1
+        return Token(NUMBER, text, *self._location(start))
     
     def _tokenize_string(self):
         """Tokenize a string literal."""
-        start_pos = self.pos
-        self.pos += 1  # Skip opening quote
-        self.column += 1
-        
-        while self.pos < len(self.source) and self.source[self.pos] != '"':
-            if self.source[self.pos] == '\n':
-                raise LexerError(f"Unterminated string at line {self.line}")
-            
-            if self.source[self.pos] == '\\' and self.pos + 1 < len(self.source):
-                # Handle escape sequences
-                self.pos += 1
-                self.column += 1
-            
-            self.pos += 1
-            self.column += 1
-        
-        if self.pos >= len(self.source):
-            raise LexerError(f"Unterminated string at line {self.line}")
-        
-        # Skip closing quote
-        self.pos += 1
-        self.column += 1
+        # Match the whole body (escapes included) in one step; the match
+        # stops at the closing quote, a bare newline, or end of input
+        end = _RE_STRBODY.match(self.source, self.pos + 1).end()
+        if end >= len(self.source) or self.source[end] != '"':
+            raise LexerError(f"Unterminated string at line {self._location(self.pos)[0]}")
         
-        # Get the string text (including quotes)
-        text = self.source[start_pos:self.pos]
+        # Get the string text (including quotes); interned so repeated
+        # literals share one object and the codegen dedup dict compares
+        # them by pointer first
+        text = sys.intern(self.source[self.pos:end + 1])
+        start = self.pos
+        self.pos = end + 1
         
-        # Add the token and adjust position
-        self._add_token(TokenType.STRING, text)
-        self.pos -= 1  # Adjust for the _advance() call that follows
-        self.column -= 1
\ No newline at end of file
+        return Token(STRING, text, *self._location(start))
\ No newline at end of file
@@ -11,12 +11,38 @@ class ParseError(Exception):
     """Exception raised for errors during parsing."""
     pass
 
-# AST Node classes
+# Module-level aliases for the token types the expression methods test
+# per token; enum members are singletons, so identity comparison against
+# a module global skips both the enum attribute load and __eq__ dispatch.
+NUMBER = TokenType.NUMBER
+IDENTIFIER = TokenType.IDENTIFIER
+STRING = TokenType.STRING
+LPAREN = TokenType.LPAREN
+RPAREN = TokenType.RPAREN
+COMMA = TokenType.COMMA
+RETURN = TokenType.RETURN
+LET = TokenType.LET
+I32 = TokenType.I32
+I64 = TokenType.I64
+EQUALS = TokenType.EQUALS
+SEMICOLON = TokenType.SEMICOLON
+PLUS = TokenType.PLUS
+MINUS = TokenType.MINUS
+STAR = TokenType.STAR
+SLASH = TokenType.SLASH
+EOF = TokenType.EOF
+
+# Binary operator precedence for the climbing loop in _parse_expr
+_PREC = {PLUS: 1, MINUS: 1, STAR: 2, SLASH: 2}
+
+# AST Node classes. The dataclasses use slots (smaller instances, faster
+# attribute access), identity equality (codegen walks track nodes by
+# object, never by value), and keep their handwritten __repr__s.
 class ASTNode:
     """Base class for all AST nodes."""
-    pass
+    __slots__ = ()
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class NumberNode(ASTNode):
     """Node representing a numeric literal."""
     value: int
@@ -24,7 +50,7 @@ class NumberNode(ASTNode):
     def __repr__(self):
         return f"Number({self.value})"
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class StringNode(ASTNode):
     """Node representing a string literal."""
     value: str
@@ -32,7 +58,7 @@ class StringNode(ASTNode):
     def __repr__(self):
         return f"String({self.value})"
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class VariableNode(ASTNode):
     """Node representing a variable reference."""
     name: str
@@ -40,7 +66,7 @@ class VariableNode(ASTNode):
     def __repr__(self):
         return f"Variable({self.name})"
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class CallNode(ASTNode):
     """Node representing a function call."""
     callee: str
@@ -49,7 +75,7 @@ class CallNode(ASTNode):
     def __repr__(self):
         return f"Call({self.callee}, {len(self.arguments)} args)"
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class BinaryOpNode(ASTNode):
     """Node representing a binary operation."""
     left: ASTNode
@@ -59,7 +85,7 @@ class BinaryOpNode(ASTNode):
     def __repr__(self):
         return f"BinaryOp({self.left}, {self.operator}, {self.right})"
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class ReturnNode(ASTNode):
     """Node representing a return statement."""
     expression: ASTNode
@@ -67,7 +93,7 @@ class ReturnNode(ASTNode):
     def __repr__(self):
         return f"Return({self.expression})"
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class DeclarationNode(ASTNode):
     """Node representing a variable declaration."""
     type: Optional[str]  # Optional for type inference
@@ -77,7 +103,7 @@ class DeclarationNode(ASTNode):
     def __repr__(self):
         return f"Declaration({self.type}, {self.name}, {self.initializer})"
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class FunctionNode(ASTNode):
     """Node representing a function definition."""
     name: str
@@ -88,7 +114,7 @@ class FunctionNode(ASTNode):
     def __repr__(self):
         return f"Function({self.name}, {self.parameters}, {self.return_type}, {len(self.body)} statements)"
 
-@dataclass
+@dataclass(slots=True, eq=False, repr=False)
 class ProgramNode(ASTNode):
     """Root node representing a complete program."""
     functions: List[FunctionNode]
@@ -97,9 +123,44 @@ class ProgramNode(ASTNode):
         return f"Program({len(self.functions)} functions)"
 
 class Parser:
-    def __init__(self, tokens: List[Token]):
-        self.tokens = tokens
+    def __init__(self, tokens):
+        """Accepts a token list or a token iterator (Lexer.iter_tokens()).
+        
+        Iterators are pulled on demand with one token of lookahead, so a
+        full token list never has to be materialized before parsing.
+        Pulled tokens land in the same indexed buffers the expression
+        methods scan, keeping their direct ttypes[current] comparisons.
+        """
         self.current = 0
+        if isinstance(tokens, list):
+            self.tokens = tokens
+            # Token types as a plain list: the expression-level methods
+            # index it directly with identity comparisons instead of
+            # going through the _match/_check/_peek helpers
+            self._ttypes = [token.type for token in tokens]
+            self._next_token = None
+        else:
+            self.tokens = []
+            self._ttypes = []
+            self._next_token = iter(tokens).__next__
+            self._pull()  # current token
+            self._pull()  # one-token lookahead
+    
+    def _pull(self):
+        """Append the next streamed token to the buffers, if any remain."""
+        try:
+            token = self._next_token()
+        except StopIteration:
+            self._next_token = None
+            return
+        self.tokens.append(token)
+        self._ttypes.append(token.type)
+    
+    def _shift(self):
+        """Consume the current token, keeping one token of lookahead."""
+        self.current += 1
+        if self._next_token is not None:
+            self._pull()
     
     def parse(self) -> ProgramNode:
         """Parse tokens into an AST."""
@@ -129,8 +190,8 @@ class Parser:
         return_type = None
         if self._match(TokenType.ARROW):
             # Check for i32 or i64 type tokens
-            if self._match(TokenType.I32, TokenType.I64):
-                return_type = self._previous().value
+            if self._check(TokenType.I32) or self._check(TokenType.I64):
+                return_type = self._advance().value
             else:
                 return_type = self._consume(TokenType.IDENTIFIER, "Expected return type.").value
         
@@ -146,13 +207,56 @@ class Parser:
         return FunctionNode(name, parameters, return_type, body)
     
     def _statement(self) -> ASTNode:
-        """Parse a statement."""
-        if self._match(TokenType.RETURN):
+        """Parse a statement.
+        
+        The two hottest statement shapes are recognized by token pattern
+        and built directly, skipping the statement/expression method
+        stack entirely:
+        
+            return NUMBER ;
+            let (i32|i64)? NAME (= NUMBER)? ;
+        
+        Anything else falls through to the general parser.
+        """
+        cur = self.current
+        ttypes = self._ttypes
+        # The fast paths peek up to six tokens ahead; top up the streamed
+        # buffer beyond its usual one-token lookahead
+        while len(ttypes) <= cur + 6 and self._next_token is not None:
+            self._pull()
+        tokens = self.tokens
+        end = len(ttypes)
+        token_type = ttypes[cur]
+        
+        if token_type is RETURN:
+            if (cur + 2 < end and ttypes[cur + 1] is NUMBER
+                    and ttypes[cur + 2] is SEMICOLON):
+                self.current = cur + 3
+                return ReturnNode(NumberNode(int(tokens[cur + 1].value)))
+            self._shift()
             return self._return_statement()
-        elif self._match(TokenType.LET):
+        
+        if token_type is LET:
+            i = cur + 1
+            var_type = None
+            if i < end and (ttypes[i] is I32 or ttypes[i] is I64):
+                var_type = tokens[i].value
+                i += 1
+            if i < end and ttypes[i] is IDENTIFIER:
+                name = tokens[i].value
+                i += 1
+                initializer = None
+                if (i + 1 < end and ttypes[i] is EQUALS
+                        and ttypes[i + 1] is NUMBER):
+                    initializer = NumberNode(int(tokens[i + 1].value))
+                    i += 2
+                if i < end and ttypes[i] is SEMICOLON:
+                    self.current = i + 1
+                    return DeclarationNode(var_type, name, initializer)
+            self._shift()
             return self._variable_declaration()
-        else:
-            return self._expression_statement()
+        
+        return self._expression_statement()
     
     def _return_statement(self) -> ReturnNode:
         """Parse a return statement."""
@@ -164,8 +268,8 @@ class Parser:
         """Parse a variable declaration."""
         # Check for explicit type
         var_type = None
-        if self._match(TokenType.I32) or self._match(TokenType.I64):
-            var_type = self._previous().value
+        if self._check(TokenType.I32) or self._check(TokenType.I64):
+            var_type = self._advance().value
         
         name = self._consume(TokenType.IDENTIFIER, "Expected variable name.").value
         
@@ -186,53 +290,59 @@ class Parser:
     
     def _expression(self) -> ASTNode:
         """Parse an expression."""
-        return self._addition()
+        return self._parse_expr(1)
     
-    def _addition(self) -> ASTNode:
-        """Parse addition and subtraction."""
-        expr = self._multiplication()
-        
-        while self._match(TokenType.PLUS) or self._match(TokenType.MINUS):
-            operator = self._previous().type
-            right = self._multiplication()
-            expr = BinaryOpNode(expr, operator, right)
+    def _parse_expr(self, min_prec: int) -> ASTNode:
+        """Parse binary operators by precedence climbing.
         
-        return expr
-    
-    def _multiplication(self) -> ASTNode:
-        """Parse multiplication and division."""
+        One iterative loop covers every precedence level, so a bare
+        primary costs a single frame instead of one per level. Builds
+        the same left-associative tree the per-level methods did.
+        """
         expr = self._primary()
         
-        while self._match(TokenType.STAR) or self._match(TokenType.SLASH):
-            operator = self._previous().type
-            right = self._primary()
+        ttypes = self._ttypes
+        operator = ttypes[self.current]
+        prec = _PREC.get(operator)
+        while prec is not None and prec >= min_prec:
+            self._shift()
+            right = self._parse_expr(prec + 1)
             expr = BinaryOpNode(expr, operator, right)
+            operator = ttypes[self.current]
+            prec = _PREC.get(operator)
         
         return expr
     
     def _primary(self) -> ASTNode:
         """Parse primary expressions."""
-        if self._match(TokenType.NUMBER):
-            return NumberNode(int(self._previous().value))
+        ttypes = self._ttypes
+        current = self.current
+        token_type = ttypes[current]
         
-        if self._match(TokenType.STRING):
+        if token_type is NUMBER:
+            self._shift()
+            return NumberNode(int(self.tokens[current].value))
+        
+        if token_type is STRING:
+            self._shift()
             # Extract the string value without the quotes
-            string_token = self._previous().value
-            string_value = string_token[1:-1]  # Remove the quotes
-            return StringNode(string_value)
+            return StringNode(self.tokens[current].value[1:-1])
         
-        if self._match(TokenType.IDENTIFIER):
-            name = self._previous().value
+        if token_type is IDENTIFIER:
+            self._shift()
+            name = self.tokens[current].value
             
             # Check if this is a function call
-            if self._match(TokenType.LPAREN):
+            if ttypes[self.current] is LPAREN:
+                self._shift()
                 arguments = []
                 
                 # Parse arguments if any
-                if not self._check(TokenType.RPAREN):
+                if ttypes[self.current] is not RPAREN:
                     arguments.append(self._expression())
                     
-                    while self._match(TokenType.COMMA):
+                    while ttypes[self.current] is COMMA:
+                        self._shift()
                         arguments.append(self._expression())
                 
                 self._consume(TokenType.RPAREN, "Expected ')' after function arguments.")
@@ -241,7 +351,8 @@ class Parser:
             # Otherwise, it's a variable reference
             return VariableNode(name)
         
-        if self._match(TokenType.LPAREN):
+        if token_type is LPAREN:
+            self._shift()
             expr = self._expression()
             self._consume(TokenType.RPAREN, "Expected ')' after expression.")
             return expr
@@ -263,23 +374,20 @@ class Parser:
         return self._peek().type == type
     
     def _advance(self) -> Token:
-        """Advance to the next token."""
-        if not self._is_at_end():
-            self.current += 1
-        return self._previous()
+        """Consume and return the current token."""
+        token = self.tokens[self.current]
+        if token.type is not EOF:
+            self._shift()
+        return token
     
     def _is_at_end(self) -> bool:
         """Check if we've reached the end of the token stream."""
-        return self._peek().type == TokenType.EOF
+        return self._ttypes[self.current] is EOF
     
     def _peek(self) -> Token:
         """Return the current token."""
         return self.tokens[self.current]
     
-    def _previous(self) -> Token:
-        """Return the previous token."""
-        return self.tokens[self.current - 1]
-    
     def _consume(self, type, message) -> Token:
         """Consume the current token if it matches the given type."""
         if self._check(type):
@@ -0,0 +1,25 @@
+"""
+Optional build script for the Blitz compiler front-end.
+
+With Cython and a C toolchain installed, `pip install -e .` compiles
+lexer/parser/codegen to C extensions, speeding up the pure-Python compile
+phase severalfold. Without them, the plain .py sources are used unchanged —
+blitzc.py imports whichever variant is present.
+"""
+
+from setuptools import setup
+
+try:
+    from Cython.Build import cythonize
+    ext_modules = cythonize(
+        ["lexer.py", "parser.py", "codegen.py"], language_level=3)
+except ImportError:
+    ext_modules = []
+
+setup(
+    name="blitzc",
+    version="0.1.0",
+    description="Compiler for the Blitz programming language",
+    py_modules=["blitzc", "lexer", "parser", "codegen"],
+    ext_modules=ext_modules,
+)